@@ -143,6 +143,7 @@ class PrefixModelForCausalLM(paddle.nn.Layer):
             self.prefix_dropout = nn.Dropout(p=prefix_config.prefix_dropout)
         self.prefix_tokens = paddle.arange(self.prefix_config.num_prefix_tokens, dtype="int64")
         self.model_prepare_inputs_for_generation = self.model.prepare_inputs_for_generation
+        self._prefix_attention_mask = None
         self.inference = False
         self.postprocess_past_key_value = postprocess_past_key_value
         self.pad_attention_mask = pad_attention_mask
@@ -187,8 +188,12 @@ class PrefixModelForCausalLM(paddle.nn.Layer):
             raise ValueError("input_ids must be provided for Peft model generation")
 
         self.model.prepare_inputs_for_generation = self._prepare_inputs_for_generation
-        outputs = self.model.generate(**kwargs)
-        self.model.prepare_inputs_for_generation = self.model_prepare_inputs_for_generation
+        self._prefix_attention_mask = None
+        try:
+            outputs = self.model.generate(**kwargs)
+        finally:
+            self._prefix_attention_mask = None
+            self.model.prepare_inputs_for_generation = self.model_prepare_inputs_for_generation
         return outputs
 
     def _prepare_inputs_for_generation(self, *args, **kwargs):
@@ -199,9 +204,19 @@ class PrefixModelForCausalLM(paddle.nn.Layer):
                 model_kwargs["input_ids"].shape, self.prefix_config.num_prefix_tokens, attention_mask
             )
         else:
-            prefix_attention_mask = paddle.ones(
-                [model_kwargs["input_ids"].shape[0], self.prefix_config.num_prefix_tokens], dtype=attention_mask.dtype
-            )
+            # The prefix mask only depends on batch size and dtype, so it is reused
+            # across the decoding steps of one `generate` call.
+            batch_size = model_kwargs["input_ids"].shape[0]
+            prefix_attention_mask = self._prefix_attention_mask
+            if (
+                prefix_attention_mask is None
+                or prefix_attention_mask.shape[0] != batch_size
+                or prefix_attention_mask.dtype != attention_mask.dtype
+            ):
+                prefix_attention_mask = paddle.ones(
+                    [batch_size, self.prefix_config.num_prefix_tokens], dtype=attention_mask.dtype
+                )
+                self._prefix_attention_mask = prefix_attention_mask
             attention_mask = paddle.concat((prefix_attention_mask, attention_mask), axis=1)
         model_kwargs["attention_mask"] = attention_mask
 
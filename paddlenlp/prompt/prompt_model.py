@@ -13,7 +13,10 @@
 # limitations under the License.
 
 
-from typing import Any, Dict, Optional
+import contextlib
+import functools
+import itertools
+from typing import Any, Dict, Optional, Tuple
 
 import paddle
 from paddle.static import InputSpec
@@ -23,8 +26,9 @@ from ..transformers.model_outputs import (
     MultipleChoiceModelOutput,
     SequenceClassifierOutput,
 )
+from ..utils.env import _get_bool_env
 from .prompt_utils import signature
-from .template import PrefixTemplate, Template
+from .template import ManualTemplate, PrefixTemplate, Template, UTCTemplate
 from .verbalizer import Verbalizer
 
 
@@ -40,6 +44,7 @@ class PromptModelForSequenceClassification(paddle.nn.Layer):
         verbalizer: Optional[Verbalizer] = None,
         freeze_plm: bool = False,
         freeze_dropout: bool = False,
+        use_masked_softmax: bool = False,
     ):
         super(PromptModelForSequenceClassification, self).__init__()
         self.plm = model
@@ -47,17 +52,42 @@ class PromptModelForSequenceClassification(paddle.nn.Layer):
         self.verbalizer = verbalizer
         self.freeze_plm = freeze_plm
         self.freeze_dropout = freeze_dropout
-        if self.freeze_plm:
-            for param in self.plm.parameters():
-                param.stop_gradient = True
-            if self.freeze_dropout:
-                self.plm.eval()
+        self.use_masked_softmax = use_masked_softmax
         self.forward_keys = signature(self.plm.forward)
         self._mask_token_id = self.template.tokenizer.mask_token_id
         self._pad_token_id = self.template.tokenizer.pad_token_id
         if isinstance(self.template, PrefixTemplate):
             self.plm = self.template.process_model(self.plm)
             self.forward_keys.append("past_key_values")
+        if self.freeze_plm:
+            for param in self.plm.parameters():
+                param.stop_gradient = True
+            if self.freeze_dropout:
+                self.plm.eval()
+        # Gradients only need to flow through a frozen PLM to reach trainable
+        # template parameters, so the PLM can run without autograd otherwise.
+        self._plm_no_grad = self.freeze_plm and all(p.stop_gradient for p in self.template.parameters())
+        self._forward_keys_set = frozenset(self.forward_keys)
+        # Templates whose `process_batch` is the identity, unless overridden by a subclass.
+        self._template_is_trivial = type(self.template).process_batch in (
+            ManualTemplate.process_batch,
+            UTCTemplate.process_batch,
+        )
+        self._output_handlers = {
+            MaskedLMOutput: self._handle_masked_lm_outputs,
+            SequenceClassifierOutput: self._handle_sequence_classifier_outputs,
+            MultipleChoiceModelOutput: self._handle_multiple_choice_outputs,
+        }
+        self._plm_num_labels = getattr(self.plm, "num_labels", None)
+        self._mse = paddle.nn.MSELoss()
+        self._ce = paddle.nn.CrossEntropyLoss()
+        self._bce = paddle.nn.BCEWithLogitsLoss()
+        # Converting the model call and loss into a static graph is opt-in, since
+        # programs are cached per input shape and recompiled for dynamic shapes.
+        if _get_bool_env("PPNLP_PROMPT_TO_STATIC", "false"):
+            self._compute_outputs = paddle.jit.to_static(self._forward_outputs)
+        else:
+            self._compute_outputs = self._forward_outputs
 
     def forward(
         self,
@@ -73,54 +103,88 @@ class PromptModelForSequenceClassification(paddle.nn.Layer):
         **kwargs: Dict[str, Any]
     ):
         return_dict = return_dict if return_dict is not None else False
-        return_hidden_states = kwargs.get("return_hidden_states", False)
-        input_dict = {
-            "input_ids": input_ids,
-            "token_type_ids": token_type_ids,
-            "position_ids": position_ids,
-            "masked_positions": masked_positions,
-            "soft_token_ids": soft_token_ids,
-            "attention_mask": attention_mask,
-            "encoder_ids": encoder_ids,
+        return_hidden_states = kwargs.pop("return_hidden_states", False)
+        return self._forward_with_options(
+            (return_dict, return_hidden_states),
+            input_ids,
+            token_type_ids,
+            position_ids,
+            attention_mask,
+            masked_positions,
+            soft_token_ids,
+            encoder_ids,
+            labels,
             **kwargs,
-        }
-        input_dict = self.template.process_batch(input_dict)
-        input_dict = {**input_dict, **kwargs}
-        model_inputs = {k: input_dict[k] for k in input_dict if k in self.forward_keys}
+        )
+
+    def set_inference_mode(self, return_dict: bool = True, return_hidden_states: bool = False):
+        """
+        Fix `return_dict` and `return_hidden_states` for the following forward
+        calls instead of resolving them from the arguments of every call. Both
+        options passed to `forward` are ignored until `reset_inference_mode`
+        restores the default one.
+        """
+        self.forward = functools.partial(self._forward_with_options, (return_dict, return_hidden_states))
+
+    def reset_inference_mode(self):
+        """
+        Restore the default `forward` after `set_inference_mode`.
+        """
+        self.__dict__.pop("forward", None)
+
+    def _forward_with_options(
+        self,
+        output_options: Tuple[bool, bool],
+        input_ids: paddle.Tensor,
+        token_type_ids: Optional[paddle.Tensor] = None,
+        position_ids: Optional[paddle.Tensor] = None,
+        attention_mask: Optional[paddle.Tensor] = None,
+        masked_positions: Optional[paddle.Tensor] = None,
+        soft_token_ids: Optional[paddle.Tensor] = None,
+        encoder_ids: Optional[paddle.Tensor] = None,
+        labels: Optional[paddle.Tensor] = None,
+        **kwargs: Dict[str, Any]
+    ):
+        return_dict, return_hidden_states = output_options
+        # Options fixed by `set_inference_mode` take precedence over the call arguments.
+        kwargs.pop("return_dict", None)
+        kwargs.pop("return_hidden_states", None)
+        input_args = (
+            ("input_ids", input_ids),
+            ("token_type_ids", token_type_ids),
+            ("position_ids", position_ids),
+            ("masked_positions", masked_positions),
+            ("soft_token_ids", soft_token_ids),
+            ("attention_mask", attention_mask),
+            ("encoder_ids", encoder_ids),
+        )
+        input_dict = {k: v for k, v in input_args if v is not None}
+        input_dict.update(kwargs)
+        if not self._template_is_trivial:
+            input_dict = self.template.process_batch(input_dict)
+            for key, value in kwargs.items():
+                input_dict.setdefault(key, value)
+        if self.use_masked_softmax:
+            mask = input_dict.get("attention_mask", None)
+            # Replace the additive float mask with a boolean one, where True marks
+            # the positions to attend, and let the attention layers apply it.
+            if mask is not None and mask.ndim == 4 and paddle.is_floating_point(mask):
+                input_dict["attention_mask"] = mask > -1e4
+        model_inputs = {k: input_dict[k] for k in input_dict if k in self._forward_keys_set}
         if "masked_positions" in model_inputs:
             model_inputs.pop("masked_positions")
-        model_outputs = self.plm(**model_inputs, return_dict=True)
-        if isinstance(model_outputs, MaskedLMOutput):
-            if self.verbalizer is not None:
-                logits = self.verbalizer.process_outputs(model_outputs.logits, input_dict["masked_positions"])
-                num_labels = len(self.verbalizer.label_words)
-            else:
-                raise Exception("Verbalizer is required when model uses the MaskedLM head")
-        elif isinstance(model_outputs, SequenceClassifierOutput):
-            logits = model_outputs.logits
-            num_labels = self.plm.num_labels if self.plm.num_labels is not None else self.plm.num_labels
-        elif isinstance(model_outputs, MultipleChoiceModelOutput):
-            logits = model_outputs.logits
-            num_labels = -1
-        else:
-            raise Exception(f"Model type not support yet: {type(model_outputs)}")
-
-        loss = None
-        if labels is not None:
-            if num_labels == 1:
-                loss_fct = paddle.nn.MSELoss()
-                loss = loss_fct(logits, labels)
-            elif num_labels > 0 and (labels.dtype == paddle.int64 or labels.dtype == paddle.int32):
-                loss_fct = paddle.nn.CrossEntropyLoss()
-                loss = loss_fct(logits.reshape((-1, num_labels)), labels.reshape((-1,)))
-            else:
-                loss_fct = paddle.nn.BCEWithLogitsLoss()
-                loss = loss_fct(logits, labels)
+        if return_hidden_states:
+            if "output_hidden_states" not in self._forward_keys_set:
+                raise ValueError(f"{type(self.plm).__name__} does not support `output_hidden_states`.")
+            model_inputs["output_hidden_states"] = True
+        loss, logits, hidden_states = self._compute_outputs(
+            model_inputs, input_dict.get("masked_positions"), labels, return_hidden_states
+        )
 
         if not return_dict:
             output = (logits,)
             if return_hidden_states:
-                output = output + (model_outputs.logits,)
+                output = output + (hidden_states,)
             if loss is not None:
                 return (loss,) + output
             if isinstance(output, (list, tuple)) and len(output) == 1:
@@ -130,25 +194,59 @@ class PromptModelForSequenceClassification(paddle.nn.Layer):
         return SequenceClassifierOutput(
             loss=loss,
             logits=logits,
-            hidden_states=model_outputs.logits,
+            hidden_states=hidden_states,
         )
 
+    def _forward_outputs(self, model_inputs, masked_positions=None, labels=None, return_hidden_states=False):
+        with paddle.no_grad() if self._plm_no_grad else contextlib.nullcontext():
+            model_outputs = self.plm(**model_inputs, return_dict=True)
+        handler = self._output_handlers.get(type(model_outputs), None)
+        if handler is None:
+            raise Exception(f"Model type not support yet: {type(model_outputs)}")
+        logits, num_labels = handler(model_outputs, masked_positions)
+
+        loss = None
+        if labels is not None:
+            if num_labels == 1:
+                loss = self._mse(logits, labels)
+            elif num_labels > 0 and (labels.dtype == paddle.int64 or labels.dtype == paddle.int32):
+                loss = self._ce(logits.reshape((-1, num_labels)), labels.reshape((-1,)))
+            else:
+                loss = self._bce(logits, labels)
+
+        hidden_states = model_outputs.hidden_states[-1] if return_hidden_states else None
+        return loss, logits, hidden_states
+
+    def _handle_masked_lm_outputs(self, model_outputs, masked_positions):
+        if self.verbalizer is None:
+            raise Exception("Verbalizer is required when model uses the MaskedLM head")
+        logits = self.verbalizer.process_outputs(model_outputs.logits, masked_positions)
+        return logits, len(self.verbalizer.label_words)
+
+    def _handle_sequence_classifier_outputs(self, model_outputs, masked_positions):
+        return model_outputs.logits, self._plm_num_labels
+
+    def _handle_multiple_choice_outputs(self, model_outputs, masked_positions):
+        return model_outputs.logits, -1
+
     def prompt_parameters(self):
         """
         Get the parameters of template and verbalizer.
         """
-        params = [p for p in self.template.parameters()]
-        if self.verbalizer is not None:
-            params += [p for p in self.verbalizer.parameters()]
-        return params
+        verbalizer_params = self.verbalizer.parameters() if self.verbalizer is not None else ()
+        return list(itertools.chain(self.template.parameters(), verbalizer_params))
 
-    def get_input_spec(self):
-        template_keywords = self.template.extract_template_keywords(self.template.prompt)
+    def get_input_spec(self, amp_dtype: str = "float32"):
+        template_keywords = self.template.template_keywords
         input_spec = [
             InputSpec(shape=[None, None], dtype="int64", name="input_ids"),
             InputSpec(shape=[None, None], dtype="int64", name="token_type_ids"),
             InputSpec(shape=[None, None], dtype="int64", name="position_ids"),
-            InputSpec(shape=[None, None, None, None], dtype="float32", name="attention_mask"),
+            InputSpec(
+                shape=[None, None, None, None],
+                dtype="bool" if self.use_masked_softmax else amp_dtype,
+                name="attention_mask",
+            ),
         ]
         if "mask" in template_keywords:
             input_spec.append(InputSpec(shape=[None], dtype="int64", name="masked_positions"))
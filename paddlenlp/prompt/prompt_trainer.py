@@ -249,8 +249,11 @@ class PromptTrainer(Trainer):
         if self.criterion is not None:
             # pop labels to move loss computation out of the model
             input_dict.pop("labels")
-            input_dict["return_hidden_states"] = True
-            logits, hidden_states = model(**input_dict)
+            if self.args.use_rgl:
+                # RGL is computed on the last hidden states of the PLM.
+                logits, hidden_states = model(**input_dict, return_hidden_states=True)
+            else:
+                logits = model(**input_dict)
             loss = self.criterion(logits, labels)
 
             if self.args.use_rdrop:
@@ -266,7 +269,7 @@ class PromptTrainer(Trainer):
         return (loss, outputs) if return_outputs else loss
 
     def _compute_rdrop_loss(self, model, input_dict, labels, outputs, loss):
-        re_outputs, _ = model(**input_dict)
+        re_outputs = model(**input_dict)
         ce_loss = (self.criterion(re_outputs, labels) + loss) * 0.5
         kl_loss = self.rdrop_criterion(outputs, re_outputs)
         loss = ce_loss + self.args.alpha_rdrop * kl_loss
@@ -279,28 +282,25 @@ class PromptTrainer(Trainer):
         for more details.
         """
 
-        def _max_equal(x, y):
-            return int(paddle.argmax(x, axis=0) == paddle.argmax(y, axis=0))
-
-        def _raw_equal(x, y):
-            return int(x == y)
-
         if equal_type == "raw":
-            equals = _raw_equal
+            labels = labels.reshape([-1])
         elif equal_type == "max":
-            equals = _max_equal
+            labels = paddle.argmax(labels, axis=-1)
         else:
             raise ValueError("Unsupported equal type {}.".format(equal_type))
         batch_size = embeddings.shape[0]
-        loss = 0
-        for i in range(batch_size):
-            for j in range(batch_size):
-                score = F.cosine_similarity(embeddings[i], embeddings[j], axis=0)
-                score = score.unsqueeze(0)
-                logits = paddle.concat([(1 - score) * 50, (1 + score) * 50], axis=-1)
-                label = paddle.to_tensor([equals(labels[i], labels[j])])
-                logits = logits.reshape([-1, logits.shape[-1]])
-                loss += F.cross_entropy(logits, label.unsqueeze(0))
+        # Pairwise cosine similarity over axis 0 of every example, computed as
+        # in `F.cosine_similarity`. Trailing dimensions are kept in the last axis.
+        embeddings = embeddings.reshape([batch_size, embeddings.shape[1], -1]).transpose([2, 0, 1])
+        squared_norms = paddle.sum(embeddings * embeddings, axis=-1)
+        norm_products = squared_norms.unsqueeze(2) * squared_norms.unsqueeze(1)
+        scores = paddle.matmul(embeddings, embeddings, transpose_y=True)
+        scores = scores / paddle.sqrt(paddle.clip(norm_products, min=1e-16))
+        scores = scores.transpose([1, 2, 0])
+        logits = paddle.concat([(1 - scores) * 50, (1 + scores) * 50], axis=-1)
+        logits = logits.reshape([batch_size * batch_size, -1])
+        equals = (labels.unsqueeze(1) == labels.unsqueeze(0)).astype("int64").reshape([-1, 1])
+        loss = F.cross_entropy(logits, equals, reduction="sum")
         loss = loss / (batch_size * (batch_size - 1))
         loss = loss / 100 * self.args.alpha_rgl
 
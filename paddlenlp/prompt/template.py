@@ -106,6 +106,7 @@ class Template(nn.Layer):
             self.token_types = self.create_token_type_sequence_from_prompt()
             self.positions = self.create_position_sequence_from_prompt()
             self.create_prompt_parameters()
+            self.template_keywords = self.extract_template_keywords(self._prompt)
 
     @abstractmethod
     def create_prompt_parameters(self):
@@ -742,8 +743,12 @@ class PrefixTemplate(SoftTemplate):
         input_dict["token_type_ids"] = token_type_ids.reshape([batch_size, -1])
         position_ids = paddle.masked_select(input_dict["position_ids"], input_dict["soft_token_ids"] == 0)
         input_dict["position_ids"] = position_ids.reshape([batch_size, -1])
-        if "masked_position" in input_dict and input_dict["masked_positions"] is not None:
-            input_dict["masked_positions"] = input_dict["masked_positions"] - soft_len
+        if input_dict.get("masked_positions", None) is not None:
+            # Positions are flattened over the batch, so shift each one by the soft
+            # tokens removed from its own and all preceding examples.
+            max_length = input_dict["soft_token_ids"].shape[1]
+            masked_positions = input_dict["masked_positions"]
+            input_dict["masked_positions"] = masked_positions - (masked_positions // max_length + 1) * soft_len
         input_dict["inputs_embeds"] = paddle.concat(
             [word_embeds[:, 0, :].unsqueeze(1), word_embeds[:, soft_len + 1 :, :]], axis=1
         )
@@ -756,7 +761,7 @@ class PrefixTemplate(SoftTemplate):
             input_dict["attention_mask"] = attention_mask
         input_dict["input_ids"] = None
         input_dict.pop("soft_token_ids")
-        input_dict.pop("encoder_ids")
+        input_dict.pop("encoder_ids", None)
 
         soft_embeds = self.soft_embeddings(soft_token_ids)
         soft_embeds = self.encoder_list[1](soft_embeds)
@@ -766,10 +771,8 @@ class PrefixTemplate(SoftTemplate):
 
         soft_embeds = self.dropout(soft_embeds)
         soft_embeds = paddle.transpose(soft_embeds, perm=[2, 0, 3, 1, 4])
-        soft_embeds = paddle.split(soft_embeds, num_or_sections=self.n_layer)
-        soft_embeds = [paddle.split(emb, 2) for emb in soft_embeds]
-        soft_embeds = [[x.squeeze(0) for x in emb] for emb in soft_embeds]
-        input_dict["past_key_values"] = tuple([tuple(emb) for emb in soft_embeds])
+        soft_embeds = paddle.unbind(soft_embeds, axis=0)
+        input_dict["past_key_values"] = tuple(zip(soft_embeds[0::2], soft_embeds[1::2]))
         return input_dict
 
     def _create_soft_encoders(self):
@@ -148,6 +148,10 @@ class Verbalizer(nn.Layer):
     def process_outputs(self, outputs: Tensor, masked_positions: Tensor = None):
         """
         Process outputs of `PretrainedModelForMaskedLM` over vocabulary.
+
+        `masked_positions` are indices into the flattened `[batch_size * seq_len]`
+        outputs, as built by `PromptDataCollatorWithPadding`, so that the masked
+        predictions are fetched by a single gather over rows.
         """
         if masked_positions is None:
             return outputs
@@ -167,8 +171,7 @@ class Verbalizer(nn.Layer):
         elif atype == "max":
             outputs = (outputs - 1e4 * (1 - mask)).max(axis=-1)
         elif atype == "first":
-            index = paddle.to_tensor([0])
-            outputs = paddle.index_select(outputs, index, axis=-1).squeeze(axis=-1)
+            outputs = outputs[..., 0]
         else:
             raise ValueError("Strategy {} is not supported to aggregate multiple " "tokens.".format(atype))
         return outputs
@@ -253,8 +256,7 @@ class ManualVerbalizer(Verbalizer):
         elif atype == "max":
             outputs = outputs.max(axis=1)
         elif atype == "first":
-            index = paddle.to_tensor([0])
-            outputs = paddle.index_select(outputs, index, axis=1).squeeze(1)
+            outputs = outputs[:, 0, :]
         elif atype == "product":
             new_outputs = outputs[:, 0, :]
             for index in range(1, outputs.shape[1]):
@@ -0,0 +1,92 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from unittest import mock
+
+import paddle
+
+from paddlenlp.prompt import PrefixConfig, PrefixModelForCausalLM
+from paddlenlp.prompt.prefix import llama_postprocess_past_key_value
+from paddlenlp.transformers import LlamaConfig, LlamaForCausalLM
+
+
+class PrefixModelForCausalLMTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        paddle.seed(42)
+        config = LlamaConfig(
+            vocab_size=100, hidden_size=16, intermediate_size=32, num_hidden_layers=2, num_attention_heads=2
+        )
+        cls.prefix_config = PrefixConfig(
+            num_prefix_tokens=4, num_attention_heads=2, num_hidden_layers=2, hidden_size=16
+        )
+        cls.prefix_model = PrefixModelForCausalLM(
+            LlamaForCausalLM(config), cls.prefix_config, llama_postprocess_past_key_value
+        )
+        cls.prefix_model.eval()
+
+    def _generate(self, input_ids):
+        return self.prefix_model.generate(
+            input_ids=input_ids,
+            attention_mask=paddle.ones_like(input_ids),
+            max_length=5,
+            decode_strategy="greedy_search",
+        )
+
+    def test_generate_with_cached_prefix_attention_mask(self):
+        input_ids = paddle.randint(3, 100, [2, 6])
+        prepare_inputs = self.prefix_model._prepare_inputs_for_generation
+
+        # Rebuild the prefix mask at every decoding step as a reference.
+        def prepare_inputs_without_cache(*args, **kwargs):
+            self.prefix_model._prefix_attention_mask = None
+            return prepare_inputs(*args, **kwargs)
+
+        with mock.patch.object(self.prefix_model, "_prepare_inputs_for_generation", prepare_inputs_without_cache):
+            expected_ids, _ = self._generate(input_ids)
+        output_ids, _ = self._generate(input_ids)
+        self.assertTrue(paddle.equal_all(output_ids, expected_ids))
+
+    def test_generate_with_new_batch_size(self):
+        prepare_inputs = self.prefix_model._prepare_inputs_for_generation
+        attention_masks = []
+
+        def record_attention_mask(*args, **kwargs):
+            model_kwargs = prepare_inputs(*args, **kwargs)
+            attention_masks.append(model_kwargs["attention_mask"])
+            return model_kwargs
+
+        with mock.patch.object(self.prefix_model, "_prepare_inputs_for_generation", record_attention_mask):
+            for batch_size in [2, 3]:
+                attention_masks.clear()
+                self._generate(paddle.randint(3, 100, [batch_size, 6]))
+                self.assertGreater(len(attention_masks), 0)
+                for attention_mask in attention_masks:
+                    self.assertEqual(attention_mask.shape[0], batch_size)
+                    prefix_attention_mask = attention_mask[:, : self.prefix_config.num_prefix_tokens]
+                    self.assertTrue(paddle.all(prefix_attention_mask == 1))
+                self.assertIsNone(self.prefix_model._prefix_attention_mask)
+
+    def test_generate_resets_on_error(self):
+        with mock.patch.object(self.prefix_model.model, "generate", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self._generate(paddle.randint(3, 100, [2, 6]))
+        self.assertIsNone(self.prefix_model._prefix_attention_mask)
+        prepare_inputs = self.prefix_model.model.prepare_inputs_for_generation
+        self.assertEqual(prepare_inputs, self.prefix_model.model_prepare_inputs_for_generation)
+
+
+if __name__ == "__main__":
+    unittest.main()
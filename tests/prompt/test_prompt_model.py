@@ -12,10 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
+import os
 import unittest
+from unittest import mock
+
+import paddle
 
 from paddlenlp.prompt import (
     AutoTemplate,
+    ManualVerbalizer,
     PromptDataCollatorWithPadding,
     PromptModelForSequenceClassification,
     SoftVerbalizer,
@@ -80,6 +86,89 @@ class PromptModelTest(unittest.TestCase):
         self.assertEqual(model_outputs.logits.shape[1], len(self.label_words))
         self.assertEqual(model_outputs.hidden_states.shape[0], len(examples))
 
+    def test_masked_softmax(self):
+        examples = [{"text": "百度飞桨深度学习框架"}, {"text": "这是一个测试"}]
+        batch = self.data_collator([self.template(i) for i in examples])
+        pad_mask = (batch["input_ids"] == self.tokenizer.pad_token_id).astype("float32")
+        batch["attention_mask"] = paddle.unsqueeze(pad_mask * -1e4, axis=[1, 2])
+        prompt_model = PromptModelForSequenceClassification(self.model, self.template, self.verbalizer)
+        masked_softmax_model = PromptModelForSequenceClassification(
+            self.model, self.template, self.verbalizer, use_masked_softmax=True
+        )
+        prompt_model.eval()
+        masked_softmax_model.eval()
+        logits = prompt_model(**batch)
+        masked_logits = masked_softmax_model(**batch)
+        self.assertTrue(paddle.allclose(logits, masked_logits, atol=1e-5))
+
+        input_spec = masked_softmax_model.get_input_spec()
+        self.assertEqual(input_spec[3].name, "attention_mask")
+        self.assertEqual(input_spec[3].dtype, paddle.bool)
+        self.assertEqual(prompt_model.get_input_spec()[3].dtype, paddle.float32)
+        self.assertEqual(prompt_model.get_input_spec("float16")[3].dtype, paddle.float16)
+
+    def test_set_inference_mode(self):
+        prompt_model = PromptModelForSequenceClassification(self.model, self.template, self.verbalizer)
+        prompt_model.eval()
+        examples = [{"text": "百度飞桨深度学习框架"}, {"text": "这是一个测试"}]
+        encoded_examples = [self.template(i) for i in examples]
+        logits, hidden_states = prompt_model(**self.data_collator(encoded_examples), return_hidden_states=True)
+        self.assertEqual(hidden_states.shape[0], len(examples))
+
+        prompt_model.set_inference_mode(return_dict=True, return_hidden_states=False)
+        model_outputs = prompt_model(**self.data_collator(encoded_examples))
+        self.assertIsNone(model_outputs.loss)
+        self.assertIsNone(model_outputs.hidden_states)
+        self.assertEqual(model_outputs.logits.shape[0], len(examples))
+        self.assertEqual(model_outputs.logits.shape[1], len(self.label_words))
+
+        # Options passed to the call are ignored in inference mode.
+        model_outputs = prompt_model(
+            **self.data_collator(encoded_examples), return_dict=False, return_hidden_states=True
+        )
+        self.assertIsNone(model_outputs.hidden_states)
+        self.assertTrue(paddle.allclose(model_outputs.logits, logits))
+
+        copied_model = copy.deepcopy(prompt_model)
+        self.assertIs(copied_model.forward.func.__self__, copied_model)
+
+        prompt_model.reset_inference_mode()
+        logits, hidden_states = prompt_model(**self.data_collator(encoded_examples), return_hidden_states=True)
+        self.assertEqual(logits.shape[0], len(examples))
+        self.assertEqual(hidden_states.shape[0], len(examples))
+
+    def test_hidden_states_not_supported(self):
+        prompt_model = PromptModelForSequenceClassification(self.model, self.template, self.verbalizer)
+        prompt_model._forward_keys_set = prompt_model._forward_keys_set - {"output_hidden_states"}
+        examples = [{"text": "百度飞桨深度学习框架"}, {"text": "这是一个测试"}]
+        encoded_examples = [self.template(i) for i in examples]
+        with self.assertRaises(ValueError):
+            prompt_model(**self.data_collator(encoded_examples), return_hidden_states=True)
+        model_outputs = prompt_model(**self.data_collator(encoded_examples), return_dict=True)
+        self.assertIsNone(model_outputs.hidden_states)
+
+    def test_to_static_forward_outputs(self):
+        model = AutoModelForMaskedLM.from_pretrained("__internal_testing__/tiny-random-ernie")
+        template = AutoTemplate.create_from(
+            prompt="{'text': 'text'}{'mask'}", tokenizer=self.tokenizer, max_length=512, model=model
+        )
+        verbalizer = ManualVerbalizer(self.label_words, self.tokenizer)
+        dynamic_model = PromptModelForSequenceClassification(
+            model, template, verbalizer, freeze_plm=True, freeze_dropout=True
+        )
+        with mock.patch.dict(os.environ, {"PPNLP_PROMPT_TO_STATIC": "true"}):
+            static_model = PromptModelForSequenceClassification(
+                model, template, verbalizer, freeze_plm=True, freeze_dropout=True
+            )
+        self.assertIsNot(static_model._compute_outputs, static_model._forward_outputs)
+
+        examples = [{"text": "百度飞桨深度学习框架", "labels": 0}, {"text": "这是一个测试", "labels": 1}]
+        batch = self.data_collator([template(i) for i in examples])
+        loss, logits = dynamic_model(**batch)
+        static_loss, static_logits = static_model(**batch)
+        self.assertTrue(paddle.allclose(static_logits, logits, atol=1e-5))
+        self.assertTrue(paddle.allclose(static_loss, loss, atol=1e-5))
+
     def test_efl_no_labels(self):
         prompt_model = PromptModelForSequenceClassification(self.seq_cls_model, self.template, verbalizer=None)
         examples = [{"text": "百度飞桨深度学习框架"}, {"text": "这是一个测试"}]
@@ -88,6 +177,7 @@ class PromptModelTest(unittest.TestCase):
         self.assertEqual(logits.shape[0], len(examples))
         self.assertEqual(logits.shape[1], self.num_labels)
         self.assertEqual(hidden_states.shape[0], len(examples))
+        self.assertEqual(hidden_states.shape[-1], self.seq_cls_model.config.hidden_size)
 
         model_outputs = prompt_model(
             **self.data_collator(encoded_examples), return_dict=True, return_hidden_states=True
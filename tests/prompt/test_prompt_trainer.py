@@ -0,0 +1,124 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from types import SimpleNamespace
+
+import paddle
+import paddle.nn.functional as F
+from parameterized import parameterized
+
+from paddlenlp.prompt import (
+    AutoTemplate,
+    ManualVerbalizer,
+    PromptDataCollatorWithPadding,
+    PromptModelForSequenceClassification,
+    PromptTrainer,
+)
+from paddlenlp.transformers import AutoModelForMaskedLM, AutoTokenizer
+
+
+def rgl_loss_by_pairs(embeddings, labels, alpha_rgl, equal_type="raw"):
+    """
+    Reference implementation of the RGL loss that loops over every pair.
+    """
+
+    def _max_equal(x, y):
+        return int(paddle.argmax(x, axis=0) == paddle.argmax(y, axis=0))
+
+    def _raw_equal(x, y):
+        return int(x == y)
+
+    equals = _raw_equal if equal_type == "raw" else _max_equal
+    batch_size = embeddings.shape[0]
+    loss = 0
+    for i in range(batch_size):
+        for j in range(batch_size):
+            score = F.cosine_similarity(embeddings[i], embeddings[j], axis=0)
+            score = score.unsqueeze(0)
+            logits = paddle.concat([(1 - score) * 50, (1 + score) * 50], axis=-1)
+            label = paddle.to_tensor([equals(labels[i], labels[j])])
+            logits = logits.reshape([-1, logits.shape[-1]])
+            loss += F.cross_entropy(logits, label.unsqueeze(0))
+    loss = loss / (batch_size * (batch_size - 1))
+    return loss / 100 * alpha_rgl
+
+
+class PromptTrainerTest(unittest.TestCase):
+    @parameterized.expand(
+        [
+            ([4, 8], "raw"),
+            ([4, 8], "max"),
+            ([4, 3, 8], "raw"),
+            ([4, 3, 8], "max"),
+        ]
+    )
+    def test_rgl_loss(self, shape, equal_type):
+        paddle.seed(2023)
+        batch_size, num_labels = shape[0], 3
+        embeddings = paddle.randn(shape)
+        if equal_type == "raw":
+            labels = paddle.to_tensor([0, 1, 0, 2], dtype="int64")
+        else:
+            labels = paddle.randn([batch_size, num_labels])
+        trainer = SimpleNamespace(args=SimpleNamespace(alpha_rgl=0.5))
+        loss = PromptTrainer._compute_rgl_loss(trainer, embeddings, labels, equal_type=equal_type)
+        expected_loss = rgl_loss_by_pairs(embeddings, labels, 0.5, equal_type=equal_type)
+        self.assertTrue(paddle.allclose(loss.reshape([-1]), expected_loss.reshape([-1]), rtol=1e-5, atol=1e-6))
+
+
+class PromptTrainerLossTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tokenizer = AutoTokenizer.from_pretrained("__internal_testing__/tiny-random-ernie")
+        cls.model = AutoModelForMaskedLM.from_pretrained("__internal_testing__/tiny-random-ernie")
+        cls.template = AutoTemplate.create_from(
+            prompt="{'text': 'text'}{'mask'}", tokenizer=cls.tokenizer, max_length=512, model=cls.model
+        )
+        cls.verbalizer = ManualVerbalizer({0: "0", 1: "1"}, cls.tokenizer)
+        cls.data_collator = PromptDataCollatorWithPadding(cls.tokenizer, padding=True, return_tensors="pd")
+        cls.prompt_model = PromptModelForSequenceClassification(cls.model, cls.template, cls.verbalizer)
+
+    def _compute_loss(self, use_rgl):
+        rgl_inputs = []
+
+        def _compute_rgl_loss(embeddings, labels):
+            rgl_inputs.append(embeddings)
+            return paddle.zeros([1])
+
+        trainer = SimpleNamespace(
+            criterion=paddle.nn.CrossEntropyLoss(),
+            args=SimpleNamespace(use_rdrop=False, use_rgl=use_rgl, alpha_rgl=0.5),
+            _compute_rgl_loss=_compute_rgl_loss,
+        )
+        examples = [{"text": "百度飞桨深度学习框架", "labels": 0}, {"text": "这是一个测试", "labels": 1}]
+        inputs = self.data_collator([self.template(i) for i in examples])
+        loss = PromptTrainer.compute_loss(trainer, self.prompt_model, inputs)
+        return loss, rgl_inputs
+
+    def test_rgl_uses_last_hidden_states(self):
+        loss, rgl_inputs = self._compute_loss(use_rgl=True)
+        self.assertIsNotNone(loss)
+        self.assertEqual(len(rgl_inputs), 1)
+        self.assertEqual(rgl_inputs[0].shape[0], 2)
+        self.assertEqual(rgl_inputs[0].shape[-1], self.model.config.hidden_size)
+
+    def test_loss_without_rgl(self):
+        loss, rgl_inputs = self._compute_loss(use_rgl=False)
+        self.assertIsNotNone(loss)
+        self.assertEqual(len(rgl_inputs), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,7 +18,13 @@ import numpy as np
 import paddle
 from parameterized import parameterized
 
-from paddlenlp.prompt import AutoTemplate, ManualTemplate, PrefixTemplate, SoftTemplate
+from paddlenlp.prompt import (
+    AutoTemplate,
+    ManualTemplate,
+    PrefixTemplate,
+    PromptDataCollatorWithPadding,
+    SoftTemplate,
+)
 from paddlenlp.transformers import AutoModelForMaskedLM, AutoTokenizer
 
 
@@ -49,6 +55,44 @@ class TemplateTest(unittest.TestCase):
             prompt = "{'text': 'text_a'}{'prefix': None, 'length':3}PrefixTemplate中`prefix`只能位于句首。"
             PrefixTemplate(prompt, self.tokenizer, self.max_length, self.model)
 
+    def test_prefix_process_batch(self):
+        prompt = "{'prefix': '新闻类别', 'length': 4}{'text': 'text_a'}{'mask'}"
+        template = PrefixTemplate(prompt, self.tokenizer, self.max_length, self.model)
+        template.eval()
+        data_collator = PromptDataCollatorWithPadding(self.tokenizer, padding=True, return_tensors="pd")
+        examples = [{"text_a": "天气晴朗"}, {"text_a": "下雪"}]
+        batch = data_collator([template(example) for example in examples])
+        batch_size, max_length = batch["input_ids"].shape
+        soft_token_ids = batch["soft_token_ids"]
+        soft_len = int((soft_token_ids[0] > 0).sum())
+
+        input_dict = template.process_batch(dict(batch))
+
+        # Flat masked positions should select the [MASK] rows of the shortened sequence.
+        inputs_embeds = input_dict["inputs_embeds"]
+        self.assertEqual(inputs_embeds.shape[:2], [batch_size, max_length - soft_len])
+        flat_embeds = inputs_embeds.reshape([-1, inputs_embeds.shape[-1]])
+        masked_embeds = paddle.gather(flat_embeds, input_dict["masked_positions"])
+        mask_embeds = template.word_embeddings(paddle.to_tensor([self.tokenizer.mask_token_id]))
+        self.assertEqual(masked_embeds.shape[0], len(examples))
+        self.assertTrue(paddle.allclose(masked_embeds, mask_embeds.expand_as(masked_embeds)))
+
+        # Keys and values of layer i are the (2i)-th and (2i+1)-th prefix projections.
+        soft_ids = paddle.masked_select(soft_token_ids, soft_token_ids > 0).reshape([batch_size, -1])
+        soft_embeds = template.encoder_list[1](template.soft_embeddings(soft_ids))
+        soft_embeds = soft_embeds.reshape(
+            [batch_size, soft_len, template.n_layer * 2, template.n_heads, template.embed_size // template.n_heads]
+        )
+        past_key_values = input_dict["past_key_values"]
+        self.assertEqual(len(past_key_values), template.n_layer)
+        for index, (key, value) in enumerate(past_key_values):
+            expected_key = soft_embeds[:, :, 2 * index].transpose([0, 2, 1, 3])
+            expected_value = soft_embeds[:, :, 2 * index + 1].transpose([0, 2, 1, 3])
+            self.assertEqual(key.shape, expected_key.shape)
+            self.assertEqual(value.shape, expected_value.shape)
+            self.assertTrue(paddle.allclose(key, expected_key, atol=1e-6))
+            self.assertTrue(paddle.allclose(value, expected_value, atol=1e-6))
+
     @parameterized.expand(
         [
             (
@@ -103,6 +147,14 @@ class TemplateTest(unittest.TestCase):
         encoded_token_types = template(self.example)["token_type_ids"]
         self.assertEqual(encoded_token_types, [0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0])
 
+    def test_template_keywords(self):
+        template = ManualTemplate("{'text': 'text_a'}{'mask'}", self.tokenizer, self.max_length)
+        self.assertIn("mask", template.template_keywords)
+        self.assertNotIn("sep", template.template_keywords)
+        template.set_prompt("{'text': 'text_a'}{'sep'}{'text': 'text_b'}")
+        self.assertIn("sep", template.template_keywords)
+        self.assertNotIn("mask", template.template_keywords)
+
     def test_attention_mask(self):
         expected_att = np.zeros([15, 15])
         expected_att[1:5, 5:9] = -1e4